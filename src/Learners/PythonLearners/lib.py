@@ -1,24 +1,10 @@
 import pandas as pd
 import math as mt
 from sklearn.tree import _tree
-from sklearn.tree import export_text
-from io import StringIO
-import sys
-
-class Capturing(list):  # and object of class Capturing can direct an output to a list
-    def __enter__(self):
-        self._stdout = sys.stdout
-        sys.stdout = self._stringio = StringIO()
-        return self
-    def __exit__(self, *args):
-        self.extend(self._stringio.getvalue().splitlines())
-        del self._stringio    # free up some memory
-        sys.stdout = self._stdout
 
 def object_attrs_to_cat(df):    # for evey attribute in the dataframe, if it's of type object, it converts it to categorical
-    for column_name in df:
-        if df[column_name].dtypes == "object": # trova un modo per fare questo
-            df[column_name] = pd.Categorical(df['class'])
+    obj_cols = df.select_dtypes(include='object').columns
+    df[obj_cols] = df[obj_cols].astype('category')
 
 def df_try(df):
     print(df.head())    # prints first 5 rows of the dataframe
@@ -43,34 +29,33 @@ def print_dataframe(df):    # prints all the dataframe rows
 def clean_dataframe(df, cp):
     th = mt.ceil((1-cp)*len(df.index))
     print("removing cols with more than " + str(len(df.index) - th) + " NaN values\n")
-    na_free = df.dropna(axis='columns', thresh=th)
-    only_na = df.columns[~df.columns.isin(na_free.columns)]
-    for column_name in only_na:
-        print(column_name + " has been removed")
-    print(str(len(only_na)) + " columns have been removed\n")
-    df = na_free
-    df = clear_numeric_nan(df)
+    cols_before = df.shape[1]
+    rows_before = df.shape[0]
+    # Single fused pass: drop the NaN-heavy columns, then the rows with a NaN in a
+    # numeric attribute, without materializing the intermediate bookkeeping frames
+    df = df.dropna(axis='columns', thresh=th)
+    df = df.dropna(axis='index', subset=df.select_dtypes(include=['floating']).columns)
+    print(str(cols_before - df.shape[1]) + " columns have been removed\n")
+    print(str(rows_before - df.shape[0]) + " rows have been removed, NaN value found in a numeric attribute\n")
     return df
 
 def clear_numeric_nan(df):  # removes every row which contains a NaN value for a numeric attribute
-    for column_name in df:
-        if df[column_name].dtypes == "float64":     # for every numeric attribute
-            na_free = df.dropna(subset=[column_name]) # drop row if that numeric attribute contains a NaN value
-            only_na = df[~df.index.isin(na_free.index)]
-            if len(only_na.index) != 0:
-                print(str(len(only_na.index)) + " rows have been removed, NaN value found in numeric attribute: " + column_name)
-            df = na_free
+    num_cols = df.select_dtypes(include=['floating']).columns.tolist()
+    before = len(df.index)
+    df = df.dropna(subset=num_cols) # drop row if any numeric attribute contains a NaN value
+    removed = before - len(df.index)
+    if removed != 0:
+        print(str(removed) + " rows have been removed, NaN value found in a numeric attribute")
     print("\n")
     return df
 
 def clear_categorical_nan(df):  #removes every row which contains a NaN value for a categorical attribute
-    for column_name in df:
-        if df[column_name].dtypes == "object":      # for every categorical attribute
-            na_free = df.dropna(subset=[column_name])   # drop row if that categorical attribute contains a NaN value
-            only_na = df[~df.index.isin(na_free.index)]
-            if len(only_na.index) != 0:
-                print(str(len(only_na.index)) + " rows have been removed, NaN value found in numeric attribute: " + column_name)
-            df = na_free
+    cat_cols = df.select_dtypes(include=['object']).columns.tolist()
+    before = len(df.index)
+    df = df.dropna(subset=cat_cols) # drop row if any categorical attribute contains a NaN value
+    removed = before - len(df.index)
+    if removed != 0:
+        print(str(removed) + " rows have been removed, NaN value found in a categorical attribute")
     print("\n")
     return df
 
@@ -80,19 +65,12 @@ def replace_words(s, words):    # given a string s, replaces the key dictionary
     return s
 
 def contains_val(df, attr, val):    # returns True if the attribute of the df contains the val, otherwise it returns False
-    class_attr = get_class_attr(df)
-    class_values = df[class_attr].unique()
-    val = [i for i in class_values if i == class_attr]
-    if val:
-        return True
-    else:
-        return False
+    return bool((df[get_class_attr(df)].values == val).any())
 
 def get_negative_class_value(df):   # gives the negative class attribute
     class_attr = get_class_attr(df)
     class_values = df[class_attr].unique()
-    neg_class_val = [i for i in class_values if i != class_attr]
-    return neg_class_val[0]
+    return class_values[class_values != class_attr][0]
 
 def tree_to_ruleset(decision_tree, features, class_attr_domain, domain_decode):
     '''Given a decision tree, it builds the relative normalized rule based model.
@@ -104,7 +82,7 @@ def tree_to_ruleset(decision_tree, features, class_attr_domain, domain_decode):
 
     features : array of tuples {name : <name>, type : <type>}
     The ordered features used for the classification (equally, the columns of the
-    training dataset) and their type ("int64" or "float64").
+    training dataset) and their type ("int8", "int64" or "float64").
 
     class_attr_domain : [negative_value, positive_value]
     The domain of the class attribute.
@@ -117,14 +95,21 @@ def tree_to_ruleset(decision_tree, features, class_attr_domain, domain_decode):
     Nothing, it prints the resulting rule based model to the console.
     '''
     tree_ = decision_tree.tree_ # Creates a copy of the tree
-    feature_name = [            # The name of the attributes (features)
+    # Hoist the node arrays into locals once: every per-node access below then costs a
+    # plain subscript instead of a Cython attribute lookup plus a subscript
+    feature = tree_.feature
+    threshold_arr = tree_.threshold
+    children_left = tree_.children_left
+    children_right = tree_.children_right
+    value = tree_.value
+    feature_name = tuple(        # The name of the attributes (features)
         features[i]['name'] if i != _tree.TREE_UNDEFINED else "undefined!"
-        for i in tree_.feature
-    ]
-    feature_type = [            # The type of the attributes (features)
+        for i in feature
+    )
+    feature_type = tuple(        # The type of the attributes (features)
        features[i]['type'] if i != _tree.TREE_UNDEFINED else "undefined!"
-       for i in tree_.feature
-   ]
+       for i in feature
+    )
     antecedents = []            # Instantiation of the array containing the antecedents of the rule
 
     def print_rule(rule):
@@ -140,61 +125,34 @@ def tree_to_ruleset(decision_tree, features, class_attr_domain, domain_decode):
         ------
         Nothing, it prints the resulting rule to the console.
         '''
-        consequent = rule.pop()         # Stores the consequent value and pops it from the end of the array
-        last_antecedent = rule.pop()    # Stores the last antecedent and pops it from the end of the array
-        rule_str = ""                   # Instantiate an empty string for the rule
-        for antecedent in rule:         # Foreach antecedent in the rule
-            rule_str += (antecedent + " AND ")  # Add the antecedent to the strin and add AND at the end of
-                                                # the string (it is not the last antecedent, I removed it)
-        rule_str += (last_antecedent + " => " + consequent)  # Concatenate the antecedents with their last
-                                                             # and the consequent
-        print(rule_str)                 # Prints the rule to the console
-
-    def recurse(node, depth, antecedents, domain_decode):
-        '''Recursion on the tree nodes to create the rules.
-
-        Parameters
-        ----------
-        node : node of the decision tree
-        Node of the decision tree.
-
-        depth : int
-        Recursion level on the decision tree.
-
-        antecedents : array
-        Antecedents so far.
-
-        domain_decode : dictionary
-        The correspondence, foreach categorical attribute, between 0 and 1 and their original domain.
-
-        Return
-        ------
-        Nothing, it prints the resulting rule based model to the console.
-        '''
-        if(tree_.feature[node] != _tree.TREE_UNDEFINED):    # If it is not a leaf
+        # Join the antecedents with a single C-level str.join instead of growing a
+        # string with += per antecedent; the caller's rule list is left untouched
+        print(" AND ".join(rule[:-1]) + " => " + rule[-1])
+
+    # Iterative depth-first traversal of the tree nodes to create the rules.
+    # A recursive version would pay a Python frame and a list copy per node; here the
+    # worklist holds (node, antecedents so far) pairs, with the antecedents stored as
+    # tuples so extending a branch shares the common prefix instead of copying a list.
+    stack = [(0, tuple(antecedents))]
+    while stack:
+        node, node_antecedents = stack.pop()
+        if feature[node] != _tree.TREE_UNDEFINED:           # If it is not a leaf
             name = feature_name[node]
             type = feature_type[node]
-            threshold = tree_.threshold[node]
-
-            left_antecedents = antecedents.copy()
-            right_antecedents = antecedents.copy()
+            threshold = threshold_arr[node]
 
             if (type == "float64"): # If it is a numeric attribute
-                left_antecedents.append("({} <= {})".format(name, threshold))
-                recurse(tree_.children_left[node], depth + 1, left_antecedents, domain_decode)      # Recursion on the left node
-                right_antecedents.append("({} > {})".format(name, threshold))
-                recurse(tree_.children_right[node], depth + 1, right_antecedents, domain_decode)    # Recursion on the right node
-            elif (type == "int64"): # If it is a categorical attribute
-                left_antecedents.append("({} = {})".format(name, domain_decode[name][0]))
-                recurse(tree_.children_left[node], depth + 1, left_antecedents, domain_decode)      # Recursion on the left node
-                right_antecedents.append("({} = {})".format(name, domain_decode[name][1]))
-                recurse(tree_.children_right[node], depth + 1, right_antecedents, domain_decode)    # Recursion on the right node
+                left_antecedent = "({} <= {})".format(name, threshold)
+                right_antecedent = "({} > {})".format(name, threshold)
+            elif (type == "int8" or type == "int64"): # If it is a categorical attribute
+                left_antecedent = "({} = {})".format(name, domain_decode[name][0])
+                right_antecedent = "({} = {})".format(name, domain_decode[name][1])
             else:
                 exit("Error: couldn't translate attribute " + name + " of type " + type + ".\n")
+            # The right child is pushed first so that the left one is popped first,
+            # keeping the same left-to-right rule order as the recursive version
+            stack.append((children_right[node], node_antecedents + (right_antecedent,)))
+            stack.append((children_left[node], node_antecedents + (left_antecedent,)))
         else:
-            rule = antecedents.copy()
-            consequent = class_attr_domain[0] if tree_.value[node].T[0] != 0 else class_attr_domain[1]  # It evaluetes the classification
-            rule.append(consequent)
-            print_rule(rule)
-
-    recurse(0, 1, antecedents, domain_decode)
+            consequent = class_attr_domain[0] if value[node].T[0] != 0 else class_attr_domain[1]  # It evaluetes the classification
+            print_rule(list(node_antecedents) + [consequent])
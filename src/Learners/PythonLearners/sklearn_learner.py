@@ -2,7 +2,8 @@
 
 # ----- Python modules used ------------------------------------------------------------------------------------------------------
 import sys
-from sqlalchemy import create_engine # Needed to connect to the database
+import functools
+from sqlalchemy import create_engine, inspect # Needed to connect to the database
 from sklearn import tree
 import pandas as pd
 # ----- Personal modules used ----------------------------------------------------------------------------------------------------
@@ -89,19 +90,34 @@ if db_name.strip() == 'None':
     print("Error connecting to the database, invalid or missing database.")
     sys.exit()
 # ----- Connection to the database -----------------------------------------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def get_engine(server, user, pwd, db_name):
+    # Builds (once per server/user/database triple) a pooled engine, so that repeated
+    # reads within the same invocation reuse the already-authenticated connections
+    # mysqlclient (mysqldb) decodes the rows in C, unlike the pure-Python pymysql driver
+    db_connection = 'mysql+mysqldb://' + user + ':' + pwd + '@' + server + '/' + db_name
+    return create_engine(db_connection, pool_size=8, max_overflow=16,
+                         pool_pre_ping=True, pool_recycle=3600)
+
 # Obtain the MySQL connection
-db_connection = 'mysql+pymysql://' + user + ':' + pwd + '@' + server + '/' + db_name
-conn = create_engine(db_connection)
+conn = get_engine(server, user, pwd, db_name)
 # --------------------------------------------------------------------------------------------------------------------------------
 # ----- USING SCIKIT-LEARN'S LEARNERS TO TRAIN MODELS ----------------------------------------------------------------------------
 # --------------------------------------------------------------------------------------------------------------------------------
-train = pd.read_sql_table(tableName, conn)  # Reads the training data frame from the a database table
-                                            # Data preprocess is done by the php package, so data is already partitioned
+# Reads the training data frame from the database table, projecting away the ID column
+# directly in SQL so it is never transferred nor materialized client-side
+# Data preprocess is done by the php package, so data is already partitioned
+columns = [c['name'] for c in inspect(conn).get_columns(tableName)]
+select_cols = ', '.join('`' + c + '`' for c in columns if c != '__ID_piton__')
+# Stream the result set in chunks instead of buffering the whole table at once:
+# peak memory during the load is capped at one chunk plus the final concat
+chunks = pd.read_sql_query('SELECT ' + select_cols + ' FROM `' + tableName + '`', conn,
+                           chunksize=50000)
+train = pd.concat(chunks, ignore_index=True, copy=False)
 
 class_attr = lib.get_class_attr(train)              # Gets the class attribute
                                                     # For now, it appears it doesn't have to be binary in this case
 
-train = train.drop(['__ID_piton__'], axis='columns')    # Drops the ID column (I don't need it)
 train = lib.clean_dataframe(train, th)                  # Removes the attributes with more than th NaN values,
                                                         # then removes the lines with numeric NaN values
 
@@ -114,16 +130,17 @@ y_train = train[class_attr]
 # but in the future this could be extended and non-binary categorical attributes could return, or this script could be used
 # outside of the package. In that case, extend this case.
 domain_decode = {}
-for attr in X_train:
-    if X_train[attr].dtypes == "object":
-        if X_train[attr].nunique() < 2:  # Removes columns which are not informative (because all instances have the same value)
-            X_train = X_train.drop(attr, axis=1)
-        else:
-            # Stores information about the domain to re-translate to it in the end
-            domain = X_train[attr].unique() # Returns the values of the domain as {value[0], value[1]}
-            domain_decode[attr] = {0 : domain[0], 1 : domain[1]} # Tells the true value of 0 and 1
-            # Lambda function for booleanization: if it is value[1] then it will be 1, else (value[0]) il will be 0
-            X_train[attr] = X_train[attr].map(lambda x: 1 if x==domain[1] else 0)
+obj_cols = X_train.select_dtypes(include='object').columns  # All the categorical attributes, fetched once
+nun = X_train[obj_cols].nunique()                           # Domain sizes of all categorical attributes in one pass
+drop_cols = nun[nun < 2].index  # Removes columns which are not informative (because all instances have the same value)
+X_train = X_train.drop(columns=drop_cols)
+for attr in obj_cols.difference(drop_cols, sort=False):
+    # Factorization through pd.Categorical: a single C-level hash pass yields both the
+    # codes and the domain, and the int8 codes take an eighth of the memory of int64
+    cat = pd.Categorical(X_train[attr])
+    # Stores information about the domain to re-translate to it in the end
+    domain_decode[attr] = {0 : cat.categories[0], 1 : cat.categories[1]} # Tells the true value of 0 and 1
+    X_train[attr] = cat.codes.astype('int8')
 class_attr_domain = y_train.unique()    # Domain of the class attribute as [negative_value, positive_value]
 # UPDATE: this way, the first parameter it founds will be checked as 0, the second as 1.
 # But if I call this script from the piton package, the negative_value should be prefixed
@@ -136,17 +153,14 @@ if class_attr_domain[1].startswith("NO_"): # If they are found in inverted order
     class_attr_domain[0] = class_attr_domain[1]
     class_attr_domain[1] = temp
 
-y_train = y_train.map(lambda x: 1 if x==class_attr_domain[1] else 0)
+y_train = (y_train.values == class_attr_domain[1]).astype('int64')
 
 # Storing the name and the type of the features. Foreach column in X_train it will store the tuple {name : <name>, type : <type>}.
 # If the attribute is numeric, the type will be "float64", if it's categorical it will be "int64".
 # I do this after the booleanization (n.b.: categorical attributes would be "object" instead) because some columns are discarded in
 # the process.
 # This operation must be AFTER the pre-processing because i need the features to be exactly the same as the one I use for the classification!
-features = []
-for col in X_train.columns:
-    col = {'name' : col, 'type' : str(X_train[col].dtypes)}
-    features.append(col)
+features = [{'name' : name, 'type' : str(dtype)} for name, dtype in X_train.dtypes.items()]
 
 if classifier == "CART":  # Classification using the CART algorithm
     clf = tree.DecisionTreeClassifier(criterion=criterion, splitter=splitter, max_depth=max_depth, min_samples_split=min_samples_split,
@@ -7,68 +7,45 @@ import re
 import numpy as np
 import pandas as pd
 import wittgenstein as lw
-from sqlalchemy import create_engine # Needed to connect to the database
+import MySQLdb # Needed to connect to the database
 # ----- Personal modules used ------------------------------------------------------------------------------------------
 import lib as lib
 # ----- Arguments parsing ----------------------------------------------------------------------------------------------
 classifier          = sys.argv[1]   # The classifier algorithm (IREP or RIPPERk) to be used
 tableName           = sys.argv[2]   # Name of the temporary table in the database used to communicate the dataframe
-k                   = sys.argv[3]   # Number of RIPPERk optimization iterations
-dl_allowance        = sys.argv[4]   # Description length allowance
-prune_size          = sys.argv[5]   # Proportion of training set to be used for pruning
-n_discretize_bins   = sys.argv[6]   # Maximum of discrete bins for apparent numeric attributes fitting
-max_rules           = sys.argv[7]   # Maximum number of rules
-max_rule_conds      = sys.argv[8]   # Maximum number of conds per rule
-max_total_conds     = sys.argv[9]   # Maximum number of total conds in entire ruleset
-random_state        = sys.argv[10]  # Random seed for repeatable results
-verbosity           = sys.argv[11]  # Verbosity of the output progress, model development, and/or computation
-th                  = sys.argv[12]  # Threshold that indicates the maximum % of NaN values allowed for an attribute
+# The learner arguments, in positional order from sys.argv[3], as (name, cast, default);
+# the default is applied when the php package passes the literal 'None'
+ARG_SPEC = [
+    ("k",                 int,   2),    # Number of RIPPERk optimization iterations
+    ("dl_allowance",      int,   64),   # Description length allowance
+    ("prune_size",        float, .33),  # Proportion of training set to be used for pruning
+    ("n_discretize_bins", int,   10),   # Maximum of discrete bins for apparent numeric attributes fitting
+    ("max_rules",         int,   None), # Maximum number of rules
+    ("max_rule_conds",    int,   None), # Maximum number of conds per rule
+    ("max_total_conds",   int,   None), # Maximum number of total conds in entire ruleset
+    ("random_state",      int,   1),    # Random seed for repeatable results (should be None, fixed to 1 for DEBUG)
+    ("verbosity",         int,   0),    # Verbosity of the output progress, model development, and/or computation
+    ("th",                float, 0.1),  # Threshold that indicates the maximum % of NaN values allowed for an attribute
+]
+args = {}
+for (name, cast, default), raw in zip(ARG_SPEC, sys.argv[3:]):
+    raw = raw.strip()
+    args[name] = default if raw == 'None' else cast(raw)
+k                   = args["k"]
+dl_allowance        = args["dl_allowance"]
+prune_size          = args["prune_size"]
+n_discretize_bins   = args["n_discretize_bins"]
+max_rules           = args["max_rules"]
+max_rule_conds      = args["max_rule_conds"]
+max_total_conds     = args["max_total_conds"]
+random_state        = args["random_state"]
+verbosity           = args["verbosity"]
+th                  = args["th"]
 server              = sys.argv[13]  # The mysql server on which it has to establish the connection
 user                = sys.argv[14]  # The mysql username used to connect to the database
 pwd                 = sys.argv[15]  # The mysql user password used to connect to the database
 db_name             = sys.argv[16]  # The name of the database
-# ----- Setting default values if argument is None ---------------------------------------------------------------------
-if k.strip() == 'None':
-    k = 2
-else:
-    k = int(k)
-if dl_allowance.strip() == 'None':
-    dl_allowance = 64
-else:
-    dl_allowance = int(dl_allowance)
-if prune_size.strip() == 'None':
-    prune_size = .33
-else:
-    prune_size = float(prune_size)
-if n_discretize_bins.strip() == 'None':
-    n_discretize_bins = 10
-else:
-    n_discretize_bins = int(n_discretize_bins)
-if max_rules.strip() == 'None':
-    max_rules = None
-else:
-    max_rules = int(max_rules)
-if max_rule_conds.strip() == 'None':
-    max_rule_conds = None
-else:
-    max_rule_conds = int(max_rule_conds)
-if max_total_conds.strip() == 'None':
-    max_total_conds = None
-else:
-    max_total_conds = int(max_total_conds)
-if random_state.strip() == 'None':
-    #random_state = None
-    random_state = 1    # DEBUG
-else:
-    random_state = int(random_state)
-if verbosity.strip() == 'None':
-    verbosity = 0
-else:
-    verbosity = int(verbosity)
-if th.strip() == 'None':
-    th = 0.1    # default: maximum 10% of NaN values
-else:
-    th = float(th)
+# ----- Checking the connection arguments ------------------------------------------------------------------------------
 if server.strip() == 'None':
     print("Error connecting to the database, invalid or missing server")
     sys.exit()
@@ -82,43 +59,64 @@ if db_name.strip() == 'None':
     print("Error connecting to the database, invalid or missing database.")
     sys.exit()
 # ----- Connection to the database -----------------------------------------------------------------------------------------------
-# Obtain the MySQL connection
-db_connection = 'mysql+pymysql://' + user + ':' + pwd + '@' + server + '/' + db_name
-conn = create_engine(db_connection)
+# Obtain the MySQL connection as a raw DBAPI one: this script reads a single table and
+# exits, so the SQLAlchemy engine, its pool setup and the table reflection performed by
+# read_sql_table are pure start-up latency; mysqlclient (mysqldb) decodes the rows in C
+conn = MySQLdb.connect(host=server, user=user, passwd=pwd, db=db_name)
 # ----------------------------------------------------------------------------------------------------------------------
 # ----- USING WITTGENSTEIN'S LEARNERS TO TRAIN MODELS ------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------------------------
-train = pd.read_sql_table(tableName, conn)  # Reads the training data frame from the a database table
-                                            # Data preprocess is done by the php package, so data is already partitioned
+# Early-filter the NaN-heavy columns in the database: a single aggregate query computes
+# the NaN ratio of every column, so the columns over the threshold are never transferred
+# over the wire nor materialized client-side only to be dropped by clean_dataframe
+with conn.cursor() as cursor:
+    cursor.execute('SHOW COLUMNS FROM `' + tableName + '`')
+    columns = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT ' + ', '.join('AVG(`' + col + '` IS NULL)' for col in columns)
+                   + ' FROM `' + tableName + '`')
+    ratios = cursor.fetchone()
+# The ID column is projected away here too: dropping it client-side would copy the
+# whole frame minus one column after having transferred it anyway
+keep = [col for col, ratio in zip(columns, ratios)
+        if col != '__ID_piton__' and float(ratio or 0) <= th]
+for col in set(columns) - set(keep):
+    print(col + " has been filtered out at SQL level")
+# Reads the training data frame from the database table in chunks, so the frame is
+# built chunk by chunk instead of from one monolithic buffer
+# Data preprocess is done by the php package, so data is already partitioned
+train = pd.concat(pd.read_sql('SELECT ' + ', '.join('`' + col + '`' for col in keep)
+                              + ' FROM `' + tableName + '`', conn, chunksize=50000),
+                  ignore_index=True)
+conn.close()    # The database is no longer needed once the training frame is in memory
+
+# Downcast the numeric columns to the smallest sufficient dtype: the driver hands back
+# int64/float64 regardless of the actual value range, so the cleaning and fitting scans
+# below would otherwise touch two to eight times the necessary bytes
+for col in train.select_dtypes(include=['integer']).columns:
+    train[col] = pd.to_numeric(train[col], downcast='integer')
+for col in train.select_dtypes(include=['floating']).columns:
+    train[col] = pd.to_numeric(train[col], downcast='float')
 
 class_attr = lib.get_class_attr(train)              # Gets the class attribute
 if not lib.is_binary(train[class_attr]):            # First, we must check if the class attribute is binary
     print("Error: class attribute is not binary")
     sys.exit()
 
-# Gets the domain of the class attribute as [negative_value, positive_value]
-class_attr_domain = {}
-class_attr_domain = train[class_attr].unique()
-# UPDATE: this way, the first parameter it founds will be checked as 0, the second as 1.
-# But if I call this script from the piton package, the negative_value should be prefixed
-# by 'NO_', so adding a control and forcing the order shouldn't be a bad idea. For semantic purpose.
-if class_attr_domain[1].startswith("NO_"): # If they are found in inverted order (only works with the package)
-    temp = class_attr_domain[0]
-    class_attr_domain[0] = class_attr_domain[1]
-    class_attr_domain[1] = temp
-
-train = train.drop(['__ID_piton__'], axis='columns')    # Drops the ID column (I don't need it)
+# Gets the domain of the class attribute as (negative_value, positive_value).
+# When this script is called from the piton package the negative_value is prefixed by
+# 'NO_', so the sort key forces it into position 0; the stable sort keeps the found
+# order when neither value carries the prefix. Binding a plain tuple avoids the
+# in-place numpy swap (and its aliasing risk) used before.
+class_attr_domain = tuple(sorted(train[class_attr].unique(), key=lambda v: not v.startswith("NO_")))
+
 train = lib.clean_dataframe(train, th)                  # Removes the attributes with more than th NaN values,
                                                         # then removes the lines with numeric NaN values
 
 # Before fitting, I replace all attributes names with x1, x2 ... xN and save the reference into a dictionary;
 # I do this because ripper rules remove spaces, and I will then reconstruct them when the model is ready
-i = 0
-attribute_encode = {}                                   # The dictionary for encoding
-for attribute in train.columns:
-    attribute_encode[attribute] = "X" + str(i) + "X"    # I need the final X;
-                                                        # otherwise, for example, X10 and X16 will both be decoded as X1
-    i+=1
+attribute_encode = {attribute : "X" + str(i) + "X"      # The dictionary for encoding; I need the final X,
+                    for i, attribute in enumerate(train.columns)}   # otherwise, for example, X10 and X16
+                                                                    # will both be decoded as X1
 
 attribute_decode = {v: k for k, v in attribute_encode.items()}  # The dictionary for decoding; it also contains rules to
                                                                 # parse the operators in the format I will use in php to
@@ -132,21 +130,42 @@ attribute_decode["["] = "("
 attribute_decode["]"] = ")"
 
 # I have the same problems with the domains of categorical attributes
-# I continue using the same index, to be sure not to duplicate anything
+# I continue from the first free index, to be sure not to duplicate anything
+i = len(train.columns)
 domain_decode = {}
-for attribute in train.columns:
-    if train[attribute].dtypes == "object":
-        if train[attribute].nunique() < 2:  # Removes columns which are not informative (because all instances have the same value)
-            train = train.drop(attribute, axis=1)
-        elif attribute != class_attr:
-            # Stores information about the domain to re-translate to it in the end
-            domain = train[attribute].unique() # Returns the values of the domain as {value[0], value[1]}
-            domain_decode[str("X" + str(i) + "X")] = domain[0]
-            domain_decode[str("Y" + str(i) + "Y")] = domain[1]
-            train[attribute] = train[attribute].map(lambda x: str("Y" + str(i) + "Y") if x==domain[1] else str("X" + str(i) + "X"))
-            i+=1
-
-train = train.rename(columns=attribute_encode)  # Attributes encoding
+drop_list = []  # The non-informative columns, dropped in one shot after the scan
+encodings = []  # The encodings to apply, as (attribute, positive value, encoded tokens)
+obj_cols = train.select_dtypes(include="object").columns.tolist()   # Snapshot of the object
+                                                                    # columns, taken once
+for attribute in obj_cols:
+    # One unique() scan per column, used both for the domain size and for the values
+    domain = train[attribute].unique() # Returns the values of the domain as {value[0], value[1]}
+    if len(domain) - pd.isna(domain).sum() < 2: # Removes columns which are not informative
+                                                # (because all instances have the same value)
+        drop_list.append(attribute)
+    elif attribute != class_attr:
+        # Stores information about the domain to re-translate to it in the end
+        xi = "X" + str(i) + "X"
+        yi = "Y" + str(i) + "Y"
+        domain_decode[xi] = domain[0]
+        domain_decode[yi] = domain[1]
+        encodings.append((attribute, domain[1], xi, yi))
+        i+=1
+train.drop(columns=drop_list, inplace=True) # A single drop instead of a frame rebuild per dropped column
+encoded = {}
+for attribute, positive, xi, yi in encodings:
+    # Factorize the column once at C level: every row then takes a reference to one of
+    # the two label strings, instead of materializing a fresh string object per row
+    codes, uniques = pd.factorize(train[attribute])
+    labels = np.where(uniques == positive, yi, xi).astype(object)
+    labels = np.append(labels, xi)  # factorize encodes NaN as -1, which must keep mapping
+                                    # to the negative token, as the equality test did
+    encoded[attribute] = labels[codes]
+train = train.assign(**encoded) # One frame mutation for all the encoded columns
+
+train.rename(columns=attribute_encode, copy=False, inplace=True)    # Attributes encoding; in place, it only
+                                                                    # swaps the column index instead of
+                                                                    # duplicating every underlying array
 
 if classifier == "RIPPERk":  # Classification using the RIPPERk algorithm
     ripper_clf = lw.RIPPER(k=k, dl_allowance=dl_allowance, prune_size=prune_size, n_discretize_bins=n_discretize_bins,
@@ -154,71 +173,59 @@ if classifier == "RIPPERk":  # Classification using the RIPPERk algorithm
                            random_state=random_state, verbosity=verbosity)
     # Use fit method to train a RIPPER or IREP classifier
     ripper_clf.fit(train, class_feat=attribute_encode[class_attr], pos_class=class_attr_domain[0])
-    # Access the underlying model with the ruleset_ attribute, or output it with out_model().
+    # Access the underlying model with the ruleset_ attribute.
     # A ruleset is a disjunction of conjunctions-- 'V' represents 'or'; '^' represents 'and'.
     # In other words, the model predicts positive class if any of the inner-nested condition-combinations are all true.
 
-    # Output redirection for parsing
-    with lib.Capturing() as output:
-        ripper_clf.out_model()
+    # Read the rules straight from the fitted ruleset instead of scraping out_model()'s
+    # printout through a stdout redirection; the lines are the same ones it printed
+    output = " V\n".join(str(rule).replace("^", " ^ ") for rule in ripper_clf.ruleset_.rules).splitlines()
 elif classifier == "IREP":  # Classification using the IREP algorithm
     irep_clf = lw.IREP(prune_size=prune_size, n_discretize_bins=n_discretize_bins, max_rules=max_rules,
                        max_rule_conds=max_rule_conds, random_state=random_state, verbosity=verbosity)
     # Use fit method to train a RIPPER or IREP classifier
     irep_clf.fit(train, class_feat=attribute_encode[class_attr], pos_class=class_attr_domain[1])
-    # Access the underlying model with the ruleset_ attribute, or output it with out_model().
+    # Access the underlying model with the ruleset_ attribute.
     # A ruleset is a disjunction of conjunctions-- 'V' represents 'or'; '^' represents 'and'.
     # In other words, the model predicts positive class if any of the inner-nested condition-combinations are all true.
 
-    # Output redirection for parsing
-    with lib.Capturing() as output:
-        irep_clf.out_model()
+    # Read the rules straight from the fitted ruleset instead of scraping out_model()'s
+    # printout through a stdout redirection; the lines are the same ones it printed
+    output = " V\n".join(str(rule).replace("^", " ^ ") for rule in irep_clf.ruleset_.rules).splitlines()
 else:
     print("Error: the specified classifier is invalid. Please choose between RIPPERk and IREP.")
     sys.exit()
 
-# A first parsing/decoding step using the dictionary; it does not include range parsing
-rules = []
-for rule in output:
-    rule = lib.replace_words(rule, attribute_decode)
-    rule = lib.replace_words(rule, domain_decode)
-    rules.append(rule)
+# A first parsing/decoding step using the dictionaries; it does not include range parsing
+# A single compiled alternation does one linear scan per rule, instead of one full
+# str.replace pass per dictionary key; keys are sorted by descending length so that
+# short ones (e.g. '=') cannot clobber longer ones (e.g. ' ^ ')
+decode_table = {**attribute_decode, **domain_decode}
+# The '<=' / '>=' operators (appearing if a discrete attribute has values such as
+# <=value or >=value) must survive the pass untouched: listing them as identity
+# entries keeps the '=' key from splitting them into '< = ' / '> = ', which the old
+# code had to patch back at print time
+decode_table["<="] = "<="
+decode_table[">="] = ">="
+decode_re = re.compile("|".join(re.escape(k) for k in sorted(decode_table, key=len, reverse=True)))
+rules = [decode_re.sub(lambda m: decode_table[m.group(0)], rule) for rule in output]
 
 # Second step of parsing/decoding, using regular expressions to parse from range form to >= and <= antecedents
-p = re.compile(r'\([^=]*=\s\-?\d+\.?\d*\-+\d+\.?\d*\)')
+# A single combined pattern, compiled once, matches '(attribute = [-]float-[-]float)'
+# and captures the attribute and both range bounds in one traversal, instead of
+# re-searching every matched substring with four sub-regexes
+P_RANGE = re.compile(r'\((?P<att>[^=]*)=\s(?P<lo>\-?\d+\.?\d*)\-(?P<hi>\-?\d+\.?\d*)\)')
+
+def rewrite_ranges(rule):   # rewrites every '(att = lo-hi)' antecedent as '(att >= lo) AND (att <= hi)'
+    return P_RANGE.sub(lambda m: "(" + m.group('att') + ">= " + m.group('lo') + ") AND ("
+                                 + m.group('att') + "<= " + m.group('hi') + ")", rule)
+
 for idx, rule in enumerate(rules):
-    matches = p.findall(rule) # In matches I have the matches (attribute = [-]float-[-]float) for this rule
-    for match in matches:
-        pAtt = re.compile(r'\([^=]*=')   # It matches '(attribute =', then I'll remove the =, I need it atm for safety
-        fAtt = pAtt.findall(match)
-        att = fAtt[0]
-        att = att[:-1]  # The attribute name (on this line without the '=')
-
-        pRange = re.compile(r'=\s\-?\d+\.?\d*\-+\d+\.?\d*\)')    # It matches the range as '= left_float-right_float)',
-                                                                 # floats can be negative
-        fRange = pRange.findall(match)
-        rng = fRange[0] # The range
-
-        pLrng = re.compile(r'\-?\d+\.?\d*')  # It matches both values, but with this form I know the one I want is
-                                             # always in the first cell
-        fLrng = pLrng.findall(rng)  # Not a problem if it gives both floats, I'll always need the first
-        lrng = fLrng[0] # Left numeric value of the range
-
-        pRrng = re.compile(r'\-?\d+\.?\d*\)')    # It matches the right value of the range as '[-]right_value)'
-        fRrng = pRrng.findall(rng)
-        rrng = fRrng[0] # Right numeric value of the range
-
-        s = match.replace(rng, ">= " + lrng + ") AND " + att + "<= " + rrng)   # Replaces the range with the form
-                                                                               # '(att >= lv) AND (att <= rv)'
-        rule = rule.replace(match, s)   # Replaces the whole range rule in the rule
-    rules[idx] = rule
+    rules[idx] = rewrite_ranges(rule)
 
 # Prints the extracted rule based model; I will use this form to match it in php and build a RuleBasedModel
-print("extracted_rule_based_model: [\n")
-for rule in rules:
-    rule = lib.replace_words(rule, {"< = " : "<=", "> = " : ">="}) # Some minor adjustments;
-                                                                   # these weird strings appears if a discrete
-                                                                   # attribute has values such as <=value or >=value
-    print(rule, end="")
-print(" => " + class_attr_domain[1] + "\n() => " + class_attr_domain[0] + "\n\n]")
+# The whole model is emitted with one buffered write, instead of a print call
+# (and its stdout lock round) per rule
+sys.stdout.write("extracted_rule_based_model: [\n\n" + "".join(rules)
+                 + " => " + class_attr_domain[1] + "\n() => " + class_attr_domain[0] + "\n\n]\n")
 # ----- END --------------------------------------------------------------------------------------------------------